@@ -2,7 +2,12 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends
+from typing import Any
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
 from sqlalchemy.orm import Session
 
 from .. import schemas
@@ -11,6 +16,31 @@ from ..erp import ERPService
 
 router = APIRouter()
 
+_ERP_ORDERS_ADAPTER = TypeAdapter(list[schemas.ERPPurchaseOrder])
+
+
+def _inline_refs(node: Any, definitions: dict[str, Any]) -> Any:
+    """Löst ``$defs``-Verweise auf, da diese im OpenAPI-Dokument nicht auflösbar wären."""
+
+    if isinstance(node, list):
+        return [_inline_refs(entry, definitions) for entry in node]
+    if not isinstance(node, dict):
+        return node
+    if "$ref" in node:
+        siblings = {key: value for key, value in node.items() if key != "$ref"}
+        return {**_inline_refs(definitions[node["$ref"].rsplit("/", 1)[-1]], definitions), **siblings}
+    return {key: _inline_refs(value, definitions) for key, value in node.items() if key != "$defs"}
+
+
+_ERP_ORDERS_SCHEMA = _ERP_ORDERS_ADAPTER.json_schema()
+# Der Body wird roh gelesen; das Schema wird deshalb für die Dokumentation explizit angegeben.
+_ERP_ORDERS_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "application/json": {"schema": _inline_refs(_ERP_ORDERS_SCHEMA, _ERP_ORDERS_SCHEMA.get("$defs", {}))}
+    },
+}
+
 
 @router.post("/export/inventory", response_model=schemas.ERPExportResponse)
 async def export_inventory(
@@ -26,10 +56,27 @@ async def sync_purchase_orders(
     return await service.sync_purchase_orders(db)
 
 
-@router.post("/ingest/purchase-orders", response_model=schemas.ERPImportResult)
-def ingest_purchase_orders(
-    payload: list[schemas.ERPPurchaseOrder],
+@router.post(
+    "/ingest/purchase-orders",
+    response_model=schemas.ERPImportResult,
+    openapi_extra={"requestBody": _ERP_ORDERS_REQUEST_BODY},
+    responses={
+        422: {
+            "description": "Validation Error",
+            "content": {"application/json": {"schema": {"$ref": "#/components/schemas/HTTPValidationError"}}},
+        }
+    },
+)
+async def ingest_purchase_orders(
+    request: Request,
     db: Session = Depends(get_db),
     service: ERPService = Depends(get_erp_service),
 ) -> schemas.ERPImportResult:
-    return service.import_purchase_orders(db, list(payload))
+    # Große ERP-Payloads werden direkt aus den Rohdaten validiert, ohne Umweg über ein dict.
+    try:
+        payload = _ERP_ORDERS_ADAPTER.validate_json(await request.body())
+    except ValidationError as exc:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in exc.errors(include_url=False)]
+        ) from exc
+    return await run_in_threadpool(service.import_purchase_orders, db, payload)
@@ -2,26 +2,32 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
 from .. import crud, schemas
+from ..cache import read_cache
 from ..dependencies import get_db
+from .serialization import dump_json, json_response, stream_json_array
 
 router = APIRouter()
 
+_STOCK_LEVEL_LIST_ADAPTER = TypeAdapter(list[schemas.StockLevelRead])
+_TRANSACTION_LIST_ADAPTER = TypeAdapter(list[schemas.InventoryTransactionRead])
+
 
 @router.get("/levels", response_model=list[schemas.StockLevelRead])
-def read_stock_levels(db: Session = Depends(get_db)) -> list[schemas.StockLevelRead]:
-    return [schemas.StockLevelRead.model_validate(level) for level in crud.list_stock_levels(db)]
+def read_stock_levels() -> StreamingResponse:
+    return stream_json_array(_STOCK_LEVEL_LIST_ADAPTER, crud.iter_stock_levels)
 
 
 @router.get("/transactions", response_model=list[schemas.InventoryTransactionRead])
 def read_transactions(
     limit: int = Query(20, ge=1, le=100), db: Session = Depends(get_db)
-) -> list[schemas.InventoryTransactionRead]:
-    transactions = crud.list_transactions(db, limit=limit)
-    return [schemas.InventoryTransactionRead.model_validate(tx) for tx in transactions]
+) -> Response:
+    return json_response(dump_json(_TRANSACTION_LIST_ADAPTER, crud.list_transactions(db, limit=limit)))
 
 
 @router.post("/transactions", response_model=schemas.InventoryTransactionRead, status_code=status.HTTP_201_CREATED)
@@ -36,5 +42,9 @@ def create_transaction(
 
 
 @router.get("/dashboard", response_model=schemas.DashboardMetrics)
-def read_dashboard(db: Session = Depends(get_db)) -> schemas.DashboardMetrics:
-    return crud.get_inventory_overview(db)
+def read_dashboard(db: Session = Depends(get_db)) -> Response:
+    # Die Kennzahlen sind beim Aufbau bereits validiert und werden nur noch serialisiert.
+    content = read_cache.get_or_set(
+        "dashboard", lambda: crud.get_inventory_overview(db).model_dump_json().encode(), ttl=5
+    )
+    return json_response(content)
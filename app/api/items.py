@@ -2,18 +2,22 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
 from .. import crud, schemas
 from ..dependencies import get_db
+from .serialization import cached_list_response
 
 router = APIRouter()
 
+_ITEM_LIST_ADAPTER = TypeAdapter(list[schemas.ItemRead])
+
 
 @router.get("/", response_model=list[schemas.ItemRead])
-def read_items(db: Session = Depends(get_db)) -> list[schemas.ItemRead]:
-    return [schemas.ItemRead.model_validate(item) for item in crud.list_items(db)]
+def read_items(db: Session = Depends(get_db)) -> Response:
+    return cached_list_response("items", _ITEM_LIST_ADAPTER, lambda: crud.list_items(db))
 
 
 @router.post("/", response_model=schemas.ItemRead, status_code=status.HTTP_201_CREATED)
@@ -2,18 +2,22 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
 from .. import crud, schemas
 from ..dependencies import get_db
+from .serialization import cached_list_response
 
 router = APIRouter()
 
+_LOCATION_LIST_ADAPTER = TypeAdapter(list[schemas.StorageLocationRead])
+
 
 @router.get("/", response_model=list[schemas.StorageLocationRead])
-def read_locations(db: Session = Depends(get_db)) -> list[schemas.StorageLocationRead]:
-    return [schemas.StorageLocationRead.model_validate(location) for location in crud.list_locations(db)]
+def read_locations(db: Session = Depends(get_db)) -> Response:
+    return cached_list_response("locations", _LOCATION_LIST_ADAPTER, lambda: crud.list_locations(db))
 
 
 @router.post("/", response_model=schemas.StorageLocationRead, status_code=status.HTTP_201_CREATED)
@@ -3,19 +3,23 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
 from .. import crud, schemas
 from ..dependencies import get_db
 from ..models import PurchaseOrder, PurchaseOrderLine
+from .serialization import stream_json_array
 
 router = APIRouter()
 
+_PURCHASE_ORDER_LIST_ADAPTER = TypeAdapter(list[schemas.PurchaseOrderRead])
+
 
 @router.get("/", response_model=list[schemas.PurchaseOrderRead])
-def read_purchase_orders(db: Session = Depends(get_db)) -> list[schemas.PurchaseOrderRead]:
-    orders = crud.list_purchase_orders(db)
-    return [schemas.PurchaseOrderRead.model_validate(order) for order in orders]
+def read_purchase_orders() -> StreamingResponse:
+    return stream_json_array(_PURCHASE_ORDER_LIST_ADAPTER, crud.iter_purchase_orders)
 
 
 @router.post("/", response_model=schemas.PurchaseOrderRead, status_code=status.HTTP_201_CREATED)
@@ -0,0 +1,60 @@
+"""Hilfsfunktionen für direkt serialisierte API-Antworten."""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterator
+from typing import Any
+
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+
+from ..cache import read_cache
+from ..database import SessionLocal
+
+# Stammdatenlisten ändern sich selten und werden bei Änderungen ohnehin invalidiert.
+LIST_CACHE_TTL = 30.0
+
+
+def dump_json(adapter: TypeAdapter, rows: Any) -> bytes:
+    """Validiert ORM-Objekte in einem Aufruf und serialisiert sie direkt zu JSON."""
+
+    return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+
+def json_response(content: bytes) -> Response:
+    # Eine fertige Response prüft FastAPI nicht erneut gegen das response_model.
+    return Response(content=content, media_type="application/json")
+
+
+def cached_list_response(
+    namespace: str, adapter: TypeAdapter, load: Callable[[], Any], ttl: float = LIST_CACHE_TTL
+) -> Response:
+    """Liefert eine Liste aus ``read_cache``; erst bei Ablauf oder Invalidierung wird neu geladen."""
+
+    return json_response(read_cache.get_or_set(namespace, lambda: dump_json(adapter, load()), ttl=ttl))
+
+
+def stream_json_array(
+    adapter: TypeAdapter, batches: Callable[[Session], Iterator[list[Any]]]
+) -> StreamingResponse:
+    """Serialisiert eine Abfrage blockweise als JSON-Array.
+
+    Der Generator öffnet eine eigene Session, da Dependencies mit ``yield`` je nach
+    FastAPI-Version bereits vor dem Senden des Response-Bodys geschlossen werden.
+    """
+
+    def generate() -> Iterator[bytes]:
+        with SessionLocal() as db:
+            yield b"["
+            separator = b""
+            for batch in batches(db):
+                # dump_json liefert "[...]"; die Klammern jedes Blocks werden entfernt.
+                chunk = dump_json(adapter, batch)[1:-1]
+                if chunk:
+                    yield separator + chunk
+                    separator = b","
+            yield b"]"
+
+    return StreamingResponse(generate(), media_type="application/json")
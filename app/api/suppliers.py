@@ -2,18 +2,22 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
 from .. import crud, schemas
 from ..dependencies import get_db
+from .serialization import cached_list_response
 
 router = APIRouter()
 
+_SUPPLIER_LIST_ADAPTER = TypeAdapter(list[schemas.SupplierRead])
+
 
 @router.get("/", response_model=list[schemas.SupplierRead])
-def read_suppliers(db: Session = Depends(get_db)) -> list[schemas.SupplierRead]:
-    return [schemas.SupplierRead.model_validate(supplier) for supplier in crud.list_suppliers(db)]
+def read_suppliers(db: Session = Depends(get_db)) -> Response:
+    return cached_list_response("suppliers", _SUPPLIER_LIST_ADAPTER, lambda: crud.list_suppliers(db))
 
 
 @router.post("/", response_model=schemas.SupplierRead, status_code=status.HTTP_201_CREATED)
@@ -0,0 +1,62 @@
+"""Prozesslokaler Cache für häufig gelesene, selten geänderte Daten."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Callable, Hashable
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+class TTLCache:
+    """Thread-sicherer Cache mit Ablaufzeit, gruppiert nach Namensräumen.
+
+    Jeder Namensraum führt einen Versionszähler, den ``invalidate`` erhöht. Ein Wert, dessen
+    Berechnung vor einer Invalidierung begonnen hat, wird dadurch nicht mehr als aktuell
+    abgelegt.
+
+    Die Einträge gelten nur innerhalb eines Prozesses. Bei mehreren Workern begrenzt die
+    Ablaufzeit, wie lange ein Worker nach einer Änderung in einem anderen Worker veraltete
+    Daten ausliefert.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[tuple[str, Hashable], tuple[tuple[int, int], float, Any]] = {}
+        self._versions: dict[str, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def _version(self, namespace: str) -> tuple[int, int]:
+        return self._epoch, self._versions.get(namespace, 0)
+
+    def get_or_set(self, namespace: str, factory: Callable[[], T], *, ttl: float, key: Hashable = None) -> T:
+        cache_key = (namespace, key)
+        now = time.monotonic()
+        with self._lock:
+            version = self._version(namespace)
+            entry = self._entries.get(cache_key)
+        if entry is not None and entry[0] == version and entry[1] > now:
+            return entry[2]
+        value = factory()
+        with self._lock:
+            if self._version(namespace) == version:
+                self._entries[cache_key] = (version, now + ttl, value)
+        return value
+
+    def invalidate(self, *namespaces: str) -> None:
+        """Verwirft alle Einträge der angegebenen Namensräume (ohne Angabe: alle)."""
+
+        with self._lock:
+            if not namespaces:
+                self._epoch += 1
+                self._entries.clear()
+                return
+            for namespace in namespaces:
+                self._versions[namespace] = self._versions.get(namespace, 0) + 1
+            for cache_key in [key for key in self._entries if key[0] in namespaces]:
+                del self._entries[cache_key]
+
+
+read_cache = TTLCache()
@@ -2,15 +2,18 @@
 
 from __future__ import annotations
 
-from collections.abc import Iterable
-from datetime import datetime
+from collections.abc import Iterable, Iterator
 from typing import Any
 
-from sqlalchemy import func
+from pydantic import TypeAdapter
+from sqlalchemy import delete, exists, func, insert, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 from . import schemas
+from .cache import read_cache
+from .database import IMMEDIATE_TRANSACTION_OPTIONS
 from .models import (
     InventoryTransaction,
     Item,
@@ -21,6 +24,14 @@ from .models import (
     StorageLocation,
     Supplier,
     TransactionType,
+    normalize_supplier_name,
+)
+
+
+_TRANSACTION_LIST_ADAPTER = TypeAdapter(list[schemas.InventoryTransactionRead])
+# Bestellungen in diesen Status zählen weder als offen noch als bestellte Menge.
+_CLOSED_PURCHASE_ORDER_STATUSES = frozenset(
+    {PurchaseOrderStatus.CANCELLED.value, PurchaseOrderStatus.COMPLETED.value}
 )
 
 
@@ -28,8 +39,84 @@ class CRUDException(RuntimeError):
     """Basisausnahme für CRUD-Operationen."""
 
 
+def _exists(db: Session, *criteria: Any) -> bool:
+    # EXISTS liefert nur einen booleschen Wert, ohne eine Zeile als ORM-Objekt zu laden.
+    return bool(db.scalar(select(exists().where(*criteria))))
+
+
+# Unveränderliche Statements werden einmalig beim Import gebaut; SQLAlchemy cacht das kompilierte SQL.
+_LIST_ITEMS = select(Item).order_by(Item.name)
+_LIST_LOCATIONS = select(StorageLocation).order_by(StorageLocation.name)
+_FIRST_LOCATION = select(StorageLocation).order_by(StorageLocation.id).limit(1)
+_LIST_SUPPLIERS = select(Supplier).order_by(Supplier.name)
+_LIST_STOCK_LEVELS = (
+    select(StockLevel)
+    .options(joinedload(StockLevel.item), joinedload(StockLevel.location))
+    .order_by(StockLevel.id)
+)
+# Für den ERP-Export genügen einzelne Spalten; ORM-Objekte werden dafür nicht benötigt.
+_INVENTORY_SNAPSHOT_ROWS = (
+    select(
+        Item.sku,
+        Item.name.label("item_name"),
+        StorageLocation.name.label("location"),
+        StockLevel.quantity,
+        Item.unit_of_measure,
+    )
+    .join(StockLevel.item)
+    .join(StockLevel.location)
+    .order_by(StockLevel.id)
+)
+# Ändert sich mit jeder Bestandsbewegung und jedem neuen Bestandseintrag.
+_INVENTORY_FINGERPRINT = select(
+    select(func.max(InventoryTransaction.id)).scalar_subquery(),
+    select(func.count(StockLevel.id)).scalar_subquery(),
+)
+_LIST_TRANSACTIONS = (
+    select(InventoryTransaction)
+    .options(joinedload(InventoryTransaction.item), joinedload(InventoryTransaction.location))
+    .order_by(InventoryTransaction.created_at.desc(), InventoryTransaction.id.desc())
+)
+# Die Bestandsseite lädt Artikel und Lagerorte ohnehin vollständig; Bestände und Buchungen
+# finden ihre Beziehungen danach in der Identity Map der Session und brauchen keinen JOIN.
+_INVENTORY_PAGE_STOCK_LEVELS = select(StockLevel).order_by(StockLevel.id)
+_INVENTORY_PAGE_TRANSACTIONS = select(InventoryTransaction).order_by(
+    InventoryTransaction.created_at.desc(), InventoryTransaction.id.desc()
+)
+_LIST_PURCHASE_ORDERS = (
+    select(PurchaseOrder)
+    .options(
+        joinedload(PurchaseOrder.supplier),
+        selectinload(PurchaseOrder.lines).joinedload(PurchaseOrderLine.item),
+    )
+    .order_by(PurchaseOrder.created_at.desc(), PurchaseOrder.id.desc())
+)
+_OPEN_LINE_QUANTITY = PurchaseOrderLine.ordered_quantity - PurchaseOrderLine.received_quantity
+_OPEN_PURCHASE_ORDER_TOTALS = (
+    select(
+        PurchaseOrderLine.purchase_order_id,
+        func.sum(_OPEN_LINE_QUANTITY).label("remaining"),
+        func.count().label("outstanding_lines"),
+    )
+    .where(_OPEN_LINE_QUANTITY > 0)
+    .group_by(PurchaseOrderLine.purchase_order_id)
+    .subquery()
+)
+_LIST_OPEN_PURCHASE_ORDER_TOTALS = (
+    select(
+        PurchaseOrder,
+        _OPEN_PURCHASE_ORDER_TOTALS.c.remaining,
+        _OPEN_PURCHASE_ORDER_TOTALS.c.outstanding_lines,
+    )
+    .join(_OPEN_PURCHASE_ORDER_TOTALS, _OPEN_PURCHASE_ORDER_TOTALS.c.purchase_order_id == PurchaseOrder.id)
+    .options(joinedload(PurchaseOrder.supplier))
+    .where(PurchaseOrder.status.notin_(_CLOSED_PURCHASE_ORDER_STATUSES))
+    .order_by(PurchaseOrder.expected_date.nulls_last(), PurchaseOrder.order_number)
+)
+
+
 def list_items(db: Session) -> list[Item]:
-    return db.query(Item).order_by(Item.name).all()
+    return list(db.scalars(_LIST_ITEMS))
 
 
 def get_item(db: Session, item_id: int) -> Item | None:
@@ -37,7 +124,7 @@ def get_item(db: Session, item_id: int) -> Item | None:
 
 
 def create_item(db: Session, item_in: schemas.ItemCreate) -> Item:
-    if db.query(Item).filter(Item.sku == item_in.sku).first():
+    if _exists(db, Item.sku == item_in.sku):
         raise CRUDException("Artikelnummer existiert bereits.")
     item = Item(
         sku=item_in.sku,
@@ -48,7 +135,7 @@ def create_item(db: Session, item_in: schemas.ItemCreate) -> Item:
     )
     db.add(item)
     db.commit()
-    db.refresh(item)
+    read_cache.invalidate("items")
     return item
 
 
@@ -59,46 +146,47 @@ def update_item(db: Session, item: Item, item_in: schemas.ItemUpdate) -> Item:
             setattr(item, field, value)
     db.add(item)
     db.commit()
-    db.refresh(item)
+    read_cache.invalidate("items")
     return item
 
 
 def delete_item(db: Session, item: Item) -> None:
     db.delete(item)
     db.commit()
+    read_cache.invalidate("items")
 
 
 def list_locations(db: Session) -> list[StorageLocation]:
-    return db.query(StorageLocation).order_by(StorageLocation.name).all()
+    return list(db.scalars(_LIST_LOCATIONS))
 
 
 def create_location(db: Session, location_in: schemas.StorageLocationCreate) -> StorageLocation:
-    if db.query(StorageLocation).filter(StorageLocation.name == location_in.name).first():
+    if _exists(db, StorageLocation.name == location_in.name):
         raise CRUDException("Lagerort existiert bereits.")
     location = StorageLocation(name=location_in.name, description=location_in.description)
     db.add(location)
     db.commit()
-    db.refresh(location)
+    read_cache.invalidate("locations")
     return location
 
 
 def ensure_default_location(db: Session) -> StorageLocation:
-    location = db.query(StorageLocation).order_by(StorageLocation.id).first()
+    location = db.scalars(_FIRST_LOCATION).first()
     if location:
         return location
     location = StorageLocation(name="Hauptlager", description="Automatisch erzeugter Standardlagerort")
     db.add(location)
     db.commit()
-    db.refresh(location)
+    read_cache.invalidate("locations")
     return location
 
 
 def list_suppliers(db: Session) -> list[Supplier]:
-    return db.query(Supplier).order_by(Supplier.name).all()
+    return list(db.scalars(_LIST_SUPPLIERS))
 
 
 def create_supplier(db: Session, supplier_in: schemas.SupplierCreate) -> Supplier:
-    if db.query(Supplier).filter(Supplier.name == supplier_in.name).first():
+    if _exists(db, Supplier.name == supplier_in.name):
         raise CRUDException("Lieferant existiert bereits.")
     supplier = Supplier(
         name=supplier_in.name,
@@ -108,29 +196,34 @@ def create_supplier(db: Session, supplier_in: schemas.SupplierCreate) -> Supplie
     )
     db.add(supplier)
     db.commit()
-    db.refresh(supplier)
+    read_cache.invalidate("suppliers")
     return supplier
 
 
 def get_supplier_by_name(db: Session, name: str) -> Supplier | None:
-    return db.query(Supplier).filter(func.lower(Supplier.name) == func.lower(name)).first()
+    return db.scalars(select(Supplier).where(Supplier.name_norm == normalize_supplier_name(name))).first()
 
 
-def list_stock_levels(db: Session) -> list[StockLevel]:
-    return (
-        db.query(StockLevel)
-        .options(selectinload(StockLevel.item), selectinload(StockLevel.location))
-        .order_by(StockLevel.id)
-        .all()
-    )
+def iter_stock_levels(db: Session, batch_size: int = 500) -> Iterator[list[StockLevel]]:
+    """Liefert alle Bestände in Blöcken, ohne das gesamte Ergebnis im Speicher zu halten."""
+
+    yield from db.scalars(_LIST_STOCK_LEVELS.execution_options(yield_per=batch_size)).partitions()
+
+
+def iter_inventory_snapshot_rows(db: Session, batch_size: int = 500) -> Iterator[list[Any]]:
+    """Bestände blockweise als Zeilen mit den Feldern von ``schemas.InventorySnapshotEntry``."""
+
+    yield from db.execute(_INVENTORY_SNAPSHOT_ROWS.execution_options(yield_per=batch_size)).partitions()
+
+
+def get_inventory_fingerprint(db: Session) -> tuple[Any, ...]:
+    return tuple(db.execute(_INVENTORY_FINGERPRINT).one())
 
 
 def get_stock_level(db: Session, item_id: int, location_id: int) -> StockLevel | None:
-    return (
-        db.query(StockLevel)
-        .filter(StockLevel.item_id == item_id, StockLevel.location_id == location_id)
-        .first()
-    )
+    return db.scalars(
+        select(StockLevel).where(StockLevel.item_id == item_id, StockLevel.location_id == location_id)
+    ).first()
 
 
 def register_inventory_transaction(
@@ -178,64 +271,76 @@ def register_inventory_transaction(
         transaction_type=transaction_in.transaction_type,
         reference=transaction_in.reference,
         note=transaction_in.note,
-        created_at=datetime.utcnow(),
     )
     db.add(transaction)
     db.commit()
-    db.refresh(transaction)
     return transaction
 
 
 def list_transactions(db: Session, limit: int = 20) -> list[InventoryTransaction]:
-    return (
-        db.query(InventoryTransaction)
-        .options(selectinload(InventoryTransaction.item), selectinload(InventoryTransaction.location))
-        .order_by(InventoryTransaction.created_at.desc())
-        .limit(limit)
-        .all()
-    )
+    return list(db.scalars(_LIST_TRANSACTIONS.limit(limit)))
 
 
-def get_inventory_overview(db: Session) -> schemas.DashboardMetrics:
-    total_items = db.query(func.count(Item.id)).scalar() or 0
-    total_quantity = db.query(func.coalesce(func.sum(StockLevel.quantity), 0)).scalar() or 0
-    open_orders = (
-        db.query(func.count(PurchaseOrder.id))
-        .filter(PurchaseOrder.status != PurchaseOrderStatus.COMPLETED)
-        .scalar()
-        or 0
-    )
+def load_inventory_page(
+    db: Session, transaction_limit: int = 15
+) -> tuple[list[StockLevel], list[Item], list[StorageLocation], list[InventoryTransaction]]:
+    """Lädt Bestände, Artikel, Lagerorte und die letzten Buchungen für die Bestandsseite.
 
-    low_stock_rows = (
-        db.query(
-            Item,
-            func.coalesce(func.sum(StockLevel.quantity), 0).label("quantity"),
+    Artikel und Lagerorte werden zuerst geladen. Der Zugriff auf ``item`` und ``location``
+    der Bestände und Buchungen wird danach aus der Session bedient, ohne weitere Abfragen.
+    """
+
+    items = list_items(db)
+    locations = list_locations(db)
+    stock_levels = list(db.scalars(_INVENTORY_PAGE_STOCK_LEVELS))
+    transactions = list(db.scalars(_INVENTORY_PAGE_TRANSACTIONS.limit(transaction_limit)))
+    return stock_levels, items, locations, transactions
+
+
+def get_inventory_overview(db: Session) -> schemas.DashboardMetrics:
+    # Die Kennzahlen werden als skalare Unterabfragen in einem einzigen Roundtrip ermittelt.
+    totals = db.execute(
+        select(
+            select(func.count(Item.id)).scalar_subquery().label("total_items"),
+            select(func.coalesce(func.sum(StockLevel.quantity), 0)).scalar_subquery().label("total_quantity"),
+            select(func.count(PurchaseOrder.id))
+            .where(PurchaseOrder.status.notin_(_CLOSED_PURCHASE_ORDER_STATUSES))
+            .scalar_subquery()
+            .label("open_orders"),
         )
-        .outerjoin(StockLevel)
-        .group_by(Item.id)
-        .having(func.coalesce(func.sum(StockLevel.quantity), 0) <= Item.reorder_level)
-        .order_by(Item.name)
-        .all()
-    )
+    ).one()
+    total_items = totals.total_items or 0
+    total_quantity = totals.total_quantity or 0
+    open_orders = totals.open_orders or 0
+
+    on_hand = func.coalesce(func.sum(StockLevel.quantity), 0.0)
     low_stock = [
-        {
-            "item_id": row.Item.id,
-            "sku": row.Item.sku,
-            "name": row.Item.name,
-            "quantity": float(row.quantity),
-            "reorder_level": row.Item.reorder_level,
-        }
-        for row in low_stock_rows
+        row._asdict()
+        for row in db.execute(
+            select(
+                Item.id.label("item_id"),
+                Item.sku,
+                Item.name,
+                on_hand.label("quantity"),
+                Item.reorder_level,
+            )
+            .outerjoin(StockLevel)
+            .group_by(Item.id)
+            .having(on_hand <= Item.reorder_level)
+            .order_by(Item.name)
+        )
     ]
 
-    recent_transactions = list_transactions(db, limit=10)
+    recent_transactions = _TRANSACTION_LIST_ADAPTER.validate_python(
+        list_transactions(db, limit=10), from_attributes=True
+    )
 
     return schemas.DashboardMetrics(
         total_items=total_items,
         total_quantity=float(total_quantity),
         open_orders=open_orders,
         low_stock=low_stock,
-        recent_transactions=[schemas.InventoryTransactionRead.model_validate(tx) for tx in recent_transactions],
+        recent_transactions=recent_transactions,
     )
 
 
@@ -243,7 +348,7 @@ def get_planning_overview(db: Session) -> list[schemas.PlanningSuggestion]:
     """Berechnet Dispositionsempfehlungen pro Artikel."""
 
     stock_subquery = (
-        db.query(
+        select(
             StockLevel.item_id.label("item_id"),
             func.coalesce(func.sum(StockLevel.quantity), 0).label("on_hand"),
         )
@@ -252,7 +357,7 @@ def get_planning_overview(db: Session) -> list[schemas.PlanningSuggestion]:
     )
 
     order_subquery = (
-        db.query(
+        select(
             PurchaseOrderLine.item_id.label("item_id"),
             func.coalesce(
                 func.sum(PurchaseOrderLine.ordered_quantity - PurchaseOrderLine.received_quantity),
@@ -260,37 +365,33 @@ def get_planning_overview(db: Session) -> list[schemas.PlanningSuggestion]:
             ).label("on_order"),
         )
         .join(PurchaseOrder, PurchaseOrderLine.purchase_order_id == PurchaseOrder.id)
-        .filter(PurchaseOrderLine.item_id.isnot(None))
-        .filter(
-            PurchaseOrder.status.notin_(
-                [PurchaseOrderStatus.CANCELLED, PurchaseOrderStatus.COMPLETED]
-            )
-        )
+        .where(PurchaseOrderLine.item_id.isnot(None))
+        .where(PurchaseOrder.status.notin_(_CLOSED_PURCHASE_ORDER_STATUSES))
         .group_by(PurchaseOrderLine.item_id)
         .subquery()
     )
 
-    rows = (
-        db.query(
+    rows = db.execute(
+        select(
             Item,
-            func.coalesce(stock_subquery.c.on_hand, 0).label("on_hand"),
-            func.coalesce(order_subquery.c.on_order, 0).label("on_order"),
+            # 0.0 statt 0, damit die Datenbank auch ohne Bestand oder Bestellung Gleitkommazahlen liefert.
+            func.coalesce(stock_subquery.c.on_hand, 0.0).label("on_hand"),
+            func.coalesce(order_subquery.c.on_order, 0.0).label("on_order"),
         )
         .outerjoin(stock_subquery, stock_subquery.c.item_id == Item.id)
         .outerjoin(order_subquery, order_subquery.c.item_id == Item.id)
         .order_by(Item.name)
-        .all()
-    )
+    ).all()
 
     suggestions: list[schemas.PlanningSuggestion] = []
     for row in rows:
         item = row.Item
-        on_hand = float(row.on_hand or 0)
-        on_order = float(row.on_order or 0)
+        on_hand = row.on_hand
+        on_order = row.on_order
         if on_order < 0:
             on_order = 0.0
         reorder_level = int(item.reorder_level or 0)
-        coverage_gap = float(reorder_level - (on_hand + on_order))
+        coverage_gap = reorder_level - (on_hand + on_order)
         shortfall = coverage_gap if coverage_gap > 0 else 0.0
         suggested_order = shortfall
         suggestions.append(
@@ -312,7 +413,7 @@ def get_planning_overview(db: Session) -> list[schemas.PlanningSuggestion]:
 
 
 def create_purchase_order(db: Session, order_in: schemas.PurchaseOrderCreate) -> PurchaseOrder:
-    if db.query(PurchaseOrder).filter(PurchaseOrder.order_number == order_in.order_number).first():
+    if _exists(db, PurchaseOrder.order_number == order_in.order_number):
         raise CRUDException("Bestellnummer existiert bereits.")
     purchase_order = PurchaseOrder(
         order_number=order_in.order_number,
@@ -327,7 +428,6 @@ def create_purchase_order(db: Session, order_in: schemas.PurchaseOrderCreate) ->
             purchase_order.lines.append(line)
     db.add(purchase_order)
     db.commit()
-    db.refresh(purchase_order)
     return purchase_order
 
 
@@ -340,7 +440,9 @@ def update_purchase_order(
             setattr(purchase_order, field, value)
     db.add(purchase_order)
     db.commit()
-    db.refresh(purchase_order)
+    if order_in.supplier_id is not None:
+        # Eine bereits geladene Lieferantenbeziehung würde sonst noch den alten Lieferanten zeigen.
+        db.expire(purchase_order, ["supplier"])
     return purchase_order
 
 
@@ -351,20 +453,27 @@ def add_purchase_order_line(
     purchase_order.lines.append(line)
     db.add(purchase_order)
     db.commit()
-    db.refresh(line)
     return line
 
 
 def list_purchase_orders(db: Session) -> list[PurchaseOrder]:
-    return (
-        db.query(PurchaseOrder)
-        .options(
-            selectinload(PurchaseOrder.supplier),
-            selectinload(PurchaseOrder.lines).selectinload(PurchaseOrderLine.item),
-        )
-        .order_by(PurchaseOrder.created_at.desc())
-        .all()
-    )
+    return list(db.scalars(_LIST_PURCHASE_ORDERS))
+
+
+def list_open_purchase_order_totals(db: Session) -> list[Any]:
+    """Liefert offene Bestellungen mit offener Menge und Anzahl offener Positionen.
+
+    Die Summen werden in der Datenbank gebildet; Bestellungen ohne offene Positionen
+    fehlen im Ergebnis.
+    """
+
+    return db.execute(_LIST_OPEN_PURCHASE_ORDER_TOTALS).all()
+
+
+def iter_purchase_orders(db: Session, batch_size: int = 500) -> Iterator[list[PurchaseOrder]]:
+    """Liefert alle Bestellungen samt Positionen in Blöcken."""
+
+    yield from db.scalars(_LIST_PURCHASE_ORDERS.execution_options(yield_per=batch_size)).partitions()
 
 
 def set_purchase_order_line_received(
@@ -375,12 +484,11 @@ def set_purchase_order_line_received(
     line.received_quantity = received_quantity
     db.add(line)
     db.commit()
-    db.refresh(line)
     return line
 
 
 def get_purchase_order_by_number(db: Session, order_number: str) -> PurchaseOrder | None:
-    return db.query(PurchaseOrder).filter(PurchaseOrder.order_number == order_number).first()
+    return db.scalars(select(PurchaseOrder).where(PurchaseOrder.order_number == order_number)).first()
 
 
 def get_purchase_order_line(db: Session, line_id: int) -> PurchaseOrderLine | None:
@@ -403,93 +511,251 @@ def _build_purchase_order_line(
     )
 
 
-def get_or_create_item_by_sku(db: Session, sku: str, defaults: dict[str, Any] | None = None) -> Item:
-    item = db.query(Item).filter(Item.sku == sku).first()
-    if item:
-        return item
-    defaults = defaults or {}
-    item = Item(
-        sku=sku,
-        name=defaults.get("name", sku),
-        description=defaults.get("description"),
-        unit_of_measure=defaults.get("unit_of_measure", "Stk"),
-        reorder_level=int(defaults.get("reorder_level", 0)),
-    )
-    db.add(item)
-    db.flush()
-    return item
+def import_purchase_orders_from_payload(
+    db: Session, payload: Iterable[schemas.ERPPurchaseOrder]
+) -> schemas.ERPImportResult:
+    """Importiert ERP-Bestellungen in einer eigenen Transaktion.
+
+    Die Session darf noch keine Transaktion offen haben: Nur dann lässt sich die Verbindung
+    mit ``IMMEDIATE_TRANSACTION_OPTIONS`` öffnen, die unter SQLite die Schreibsperre zu Beginn
+    nimmt und die Savepoints des Imports erst ermöglicht.
+    """
+
+    if db.in_transaction():
+        raise RuntimeError("Der ERP-Import benötigt eine Session ohne offene Transaktion.")
+    db.connection(execution_options=IMMEDIATE_TRANSACTION_OPTIONS)
+    orders = list(payload)
+
+    # Stammdaten und vorhandene Bestellungen werden vorab gesammelt geladen, statt pro Bestellung
+    # und Position einzeln nachzuschlagen.
+    skus = {line.sku for order in orders for line in order.lines}
+    items_by_sku = {item.sku: item for item in db.scalars(select(Item).where(Item.sku.in_(skus)))}
+    supplier_names = {normalize_supplier_name(order.supplier_name) for order in orders}
+    suppliers_by_name = {
+        supplier.name_norm: supplier
+        for supplier in db.scalars(select(Supplier).where(Supplier.name_norm.in_(supplier_names)))
+    }
+    orders_by_number = {
+        purchase_order.order_number: purchase_order
+        for purchase_order in db.scalars(
+            select(PurchaseOrder).where(
+                PurchaseOrder.order_number.in_({order.order_number for order in orders})
+            )
+        )
+    }
+
+    try:
+        with db.begin_nested():
+            result = _import_purchase_orders_bulk(db, orders, items_by_sku, suppliers_by_name, orders_by_number)
+    except IntegrityError:
+        # Mindestens eine Bestellung ist fehlerhaft; Einzelimport, damit nur diese übersprungen wird.
+        items_by_sku = {sku: item for sku, item in items_by_sku.items() if inspect(item).persistent}
+        suppliers_by_name = {
+            name: supplier for name, supplier in suppliers_by_name.items() if inspect(supplier).persistent
+        }
+        result = _import_purchase_orders_individually(
+            db, orders, items_by_sku, suppliers_by_name, orders_by_number
+        )
 
+    db.commit()
+    # Der Import legt bei Bedarf Artikel und Lieferanten an.
+    read_cache.invalidate("items", "suppliers")
+    return result
 
-def get_or_create_supplier_by_name(db: Session, name: str) -> Supplier:
-    supplier = get_supplier_by_name(db, name)
-    if supplier:
-        return supplier
-    supplier = Supplier(name=name)
-    db.add(supplier)
+
+def _import_purchase_orders_bulk(
+    db: Session,
+    orders: list[schemas.ERPPurchaseOrder],
+    items_by_sku: dict[str, Item],
+    suppliers_by_name: dict[str, Supplier],
+    orders_by_number: dict[str, PurchaseOrder],
+) -> schemas.ERPImportResult:
+    """Importiert alle Bestellungen mit wenigen Sammel-Statements."""
+
+    imported = 0
+    updated = 0
+    known_numbers = set(orders_by_number)
+    # Wird eine Bestellnummer mehrfach geliefert, gilt wie beim Einzelimport die letzte Fassung.
+    latest_orders: dict[str, schemas.ERPPurchaseOrder] = {}
+    for order in orders:
+        if order.order_number in known_numbers:
+            updated += 1
+        else:
+            imported += 1
+            known_numbers.add(order.order_number)
+        latest_orders[order.order_number] = order
+
+    for order in latest_orders.values():
+        supplier_key = normalize_supplier_name(order.supplier_name)
+        if supplier_key not in suppliers_by_name:
+            supplier = Supplier(name=order.supplier_name)
+            db.add(supplier)
+            suppliers_by_name[supplier_key] = supplier
+        for line in order.lines:
+            if line.sku not in items_by_sku:
+                item = Item(sku=line.sku, name=line.name, description=line.description)
+                db.add(item)
+                items_by_sku[line.sku] = item
+    # Neue Lieferanten und Artikel benötigen ihre IDs für die Bestellungen.
     db.flush()
-    return supplier
 
+    def order_values(order: schemas.ERPPurchaseOrder) -> dict[str, Any]:
+        return {
+            "order_number": order.order_number,
+            "supplier_id": suppliers_by_name[normalize_supplier_name(order.supplier_name)].id,
+            "status": order.status,
+            "expected_date": order.expected_date,
+            "notes": order.notes,
+        }
 
-def import_purchase_orders_from_payload(
-    db: Session, payload: Iterable[schemas.ERPPurchaseOrder]
+    order_ids = _upsert_purchase_orders(
+        db, [order_values(order) for order in latest_orders.values()], orders_by_number
+    )
+    # Positionen werden für alle Bestellungen ersetzt, die inzwischen bereits existierten.
+    db.execute(delete(PurchaseOrderLine).where(PurchaseOrderLine.purchase_order_id.in_(order_ids.values())))
+    for number in latest_orders:
+        if number in orders_by_number:
+            db.expire(orders_by_number[number])
+
+    line_rows = [
+        {
+            "purchase_order_id": order_ids[number],
+            "item_id": items_by_sku[line.sku].id,
+            "description": line.description,
+            "ordered_quantity": line.ordered_quantity,
+            "unit_price": line.unit_price,
+        }
+        for number, order in latest_orders.items()
+        for line in order.lines
+    ]
+    if line_rows:
+        db.execute(insert(PurchaseOrderLine), line_rows)
+
+    return schemas.ERPImportResult(imported=imported, updated=updated)
+
+
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+_UPSERT_COLUMNS = ("supplier_id", "status", "expected_date", "notes")
+
+
+def _upsert_purchase_orders(
+    db: Session, rows: list[dict[str, Any]], orders_by_number: dict[str, PurchaseOrder]
+) -> dict[str, int]:
+    """Legt Bestellköpfe an oder aktualisiert sie anhand der Bestellnummer; liefert deren IDs."""
+
+    dialect_insert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if dialect_insert is not None:
+        # Ein Upsert ist unabhängig davon korrekt, ob ein paralleler Import die Bestellung bereits
+        # angelegt hat, und vermeidet dabei den Konflikt auf der Unique-Constraint.
+        statement = dialect_insert(PurchaseOrder)
+        statement = statement.on_conflict_do_update(
+            index_elements=[PurchaseOrder.order_number],
+            set_={column: statement.excluded[column] for column in _UPSERT_COLUMNS},
+        ).returning(PurchaseOrder.id, PurchaseOrder.order_number)
+        return {number: order_id for order_id, number in db.execute(statement, rows)}
+
+    order_ids: dict[str, int] = {}
+    existing_rows = []
+    new_rows = []
+    for row in rows:
+        existing = orders_by_number.get(row["order_number"])
+        if existing is None:
+            new_rows.append(row)
+        else:
+            order_ids[existing.order_number] = existing.id
+            existing_rows.append({"id": existing.id, **row})
+    if existing_rows:
+        db.execute(update(PurchaseOrder), existing_rows)
+    if new_rows:
+        inserted = db.execute(insert(PurchaseOrder).returning(PurchaseOrder.id, PurchaseOrder.order_number), new_rows)
+        order_ids.update({number: order_id for order_id, number in inserted})
+    return order_ids
+
+
+def _import_purchase_orders_individually(
+    db: Session,
+    orders: list[schemas.ERPPurchaseOrder],
+    items_by_sku: dict[str, Item],
+    suppliers_by_name: dict[str, Supplier],
+    orders_by_number: dict[str, PurchaseOrder],
 ) -> schemas.ERPImportResult:
     imported = 0
     updated = 0
     skipped = 0
     details: list[str] = []
 
-    for order in payload:
-        supplier = get_or_create_supplier_by_name(db, order.supplier_name)
-        existing = get_purchase_order_by_number(db, order.order_number)
+    for order in orders:
+        existing = orders_by_number.get(order.order_number)
+        try:
+            # Jede Bestellung erhält einen eigenen Savepoint, damit ein Fehler nur diese verwirft.
+            with db.begin_nested():
+                supplier = suppliers_by_name.get(normalize_supplier_name(order.supplier_name))
+                if supplier is None:
+                    supplier = Supplier(name=order.supplier_name)
+                    db.add(supplier)
+                    suppliers_by_name[supplier.name_norm] = supplier
+
+                if existing is None:
+                    purchase_order = PurchaseOrder(
+                        order_number=order.order_number,
+                        supplier=supplier,
+                        status=order.status,
+                        expected_date=order.expected_date,
+                        notes=order.notes,
+                    )
+                    db.add(purchase_order)
+                else:
+                    purchase_order = existing
+                    purchase_order.supplier = supplier
+                    purchase_order.status = order.status
+                    purchase_order.expected_date = order.expected_date
+                    purchase_order.notes = order.notes
+                _replace_purchase_order_lines(db, purchase_order, order.lines, items_by_sku)
+        except IntegrityError as exc:  # pragma: no cover - Fehlerfall
+            skipped += 1
+            details.append(f"Bestellung {order.order_number} konnte nicht gespeichert werden: {exc!s}")
+            # Im verworfenen Savepoint angelegte Objekte sind nicht mehr Teil der Session.
+            items_by_sku = {sku: item for sku, item in items_by_sku.items() if inspect(item).persistent}
+            suppliers_by_name = {
+                name: supplier for name, supplier in suppliers_by_name.items() if inspect(supplier).persistent
+            }
+            continue
 
         if existing is None:
-            purchase_order = PurchaseOrder(
-                order_number=order.order_number,
-                supplier=supplier,
-                status=order.status,
-                expected_date=order.expected_date,
-                notes=order.notes,
-            )
-            _replace_purchase_order_lines(db, purchase_order, order.lines)
-            db.add(purchase_order)
+            orders_by_number[order.order_number] = purchase_order
             imported += 1
         else:
-            existing.supplier = supplier
-            existing.status = order.status
-            existing.expected_date = order.expected_date
-            existing.notes = order.notes
-            _replace_purchase_order_lines(db, existing, order.lines)
             updated += 1
 
-        try:
-            db.commit()
-        except IntegrityError as exc:  # pragma: no cover - Fehlerfall
-            db.rollback()
-            skipped += 1
-            details.append(f"Bestellung {order.order_number} konnte nicht gespeichert werden: {exc!s}")
-
     return schemas.ERPImportResult(imported=imported, updated=updated, skipped=skipped, details=details)
 
 
 def _replace_purchase_order_lines(
-    db: Session, purchase_order: PurchaseOrder, lines: Iterable[schemas.ERPPurchaseOrderLine]
+    db: Session,
+    purchase_order: PurchaseOrder,
+    lines: Iterable[schemas.ERPPurchaseOrderLine],
+    items_by_sku: dict[str, Item],
 ) -> None:
-    purchase_order.lines.clear()
+    lines = list(lines)
     for line in lines:
-        item = get_or_create_item_by_sku(
-            db,
-            line.sku,
-            {
-                "name": line.name,
-                "description": line.description,
-            },
-        )
-        purchase_order.lines.append(
-            PurchaseOrderLine(
-                item=item,
-                description=line.description,
-                ordered_quantity=line.ordered_quantity,
-                unit_price=line.unit_price,
-            )
-        )
+        if line.sku not in items_by_sku:
+            item = Item(sku=line.sku, name=line.name, description=line.description)
+            db.add(item)
+            items_by_sku[line.sku] = item
+    # Bestellkopf und neue Artikel benötigen ihre IDs für die Positionen.
     db.flush()
+
+    db.execute(delete(PurchaseOrderLine).where(PurchaseOrderLine.purchase_order_id == purchase_order.id))
+    rows = [
+        {
+            "purchase_order_id": purchase_order.id,
+            "item_id": items_by_sku[line.sku].id,
+            "description": line.description,
+            "ordered_quantity": line.ordered_quantity,
+            "unit_price": line.unit_price,
+        }
+        for line in lines
+    ]
+    if rows:
+        db.execute(insert(PurchaseOrderLine), rows)
+    db.expire(purchase_order, ["lines"])
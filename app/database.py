@@ -5,17 +5,61 @@ from __future__ import annotations
 import os
 from typing import Any, Dict
 
-from sqlalchemy import create_engine
+from sqlalchemy import Enum, case, create_engine, event, exists, inspect, select, text, update
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.schema import CreateIndex
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./warehouse.db")
 
 _engine_kwargs: Dict[str, Any] = {}
 if DATABASE_URL.startswith("sqlite"):
     _engine_kwargs["connect_args"] = {"check_same_thread": False}
+elif os.getenv("DATABASE_EXTERNAL_POOL", "").lower() in {"1", "true", "yes"}:
+    # Ein vorgeschalteter Pooler (z. B. PgBouncer) verwaltet die Verbindungen selbst.
+    _engine_kwargs["poolclass"] = NullPool
+else:
+    _engine_kwargs["pool_size"] = 10
+    _engine_kwargs["max_overflow"] = 20
+    _engine_kwargs["pool_timeout"] = 30
+    # Vom Server oder einer Firewall getrennte Verbindungen werden vor der Nutzung erkannt
+    # und ersetzt, statt den ersten Request danach scheitern zu lassen.
+    _engine_kwargs["pool_pre_ping"] = True
+    _engine_kwargs["pool_recycle"] = 3600
 
 engine = create_engine(DATABASE_URL, **_engine_kwargs)
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+# Execution-Optionen für Sessions, die unter SQLite Savepoints nutzen (ERP-Import).
+IMMEDIATE_TRANSACTION_OPTIONS = {"sqlite_begin_immediate": True}
+
+if engine.dialect.name == "sqlite":
+    # Im WAL-Modus blockiert ein laufender Commit keine lesenden Verbindungen.
+    _SQLITE_PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA mmap_size=268435456",
+        "PRAGMA cache_size=-65536",
+    )
+
+    @event.listens_for(engine, "connect")
+    def _configure_sqlite_connection(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        for pragma in _SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _begin_sqlite_transaction(connection) -> None:
+        # pysqlite startet Transaktionen erst beim ersten schreibenden Statement. Ein SAVEPOINT
+        # davor würde beim RELEASE sofort committen. Sessions mit Savepoints starten die
+        # Transaktion deshalb selbst, und zwar mit der Schreibsperre: Andere Schreiber warten
+        # dann auf sie, statt mitten in der Transaktion mit "database is locked" abzubrechen.
+        if connection.get_execution_options().get("sqlite_begin_immediate"):
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+# Objekte behalten nach dem Commit ihre Werte, statt beim nächsten Zugriff neu geladen zu werden.
+SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
@@ -27,3 +71,70 @@ def init_db() -> None:
 
     models  # nur zum Registrieren der Modelle benötigt
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        _upgrade_supplier_name_norm(connection)
+        _upgrade_enum_values(connection)
+    # create_all legt Indizes nur für neue Tabellen an; bestehende Datenbanken erhalten
+    # später ergänzte Indizes hier.
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                connection.execute(CreateIndex(index, if_not_exists=True))
+
+
+def _upgrade_supplier_name_norm(connection) -> None:
+    """Ergänzt ``suppliers.name_norm`` in Datenbanken, die vor Einführung der Spalte angelegt wurden."""
+    from .models import Supplier, normalize_supplier_name  # pylint: disable=import-outside-toplevel
+
+    columns = {column["name"] for column in inspect(connection).get_columns("suppliers")}
+    if "name_norm" not in columns:
+        # SQLite kann NOT NULL ohne Default nicht nachträglich ergänzen; neue Zeilen setzt das Modell.
+        connection.execute(text("ALTER TABLE suppliers ADD COLUMN name_norm VARCHAR(255)"))
+    # Die Normalisierung erfolgt in Python, da lower() in SQLite nur ASCII-Zeichen umwandelt.
+    for supplier_id, name in connection.execute(
+        select(Supplier.id, Supplier.name).where(Supplier.name_norm.is_(None))
+    ):
+        connection.execute(
+            update(Supplier).where(Supplier.id == supplier_id).values(name_norm=normalize_supplier_name(name))
+        )
+
+
+def _upgrade_enum_values(connection) -> None:
+    """Stellt die früheren ``sqlalchemy.Enum``-Spalten auf die Werte als Text um.
+
+    Das alte Schema speicherte die Namen der Enum-Mitglieder (``RECEIPT``), unter PostgreSQL
+    in nativen ENUM-Typen. Diese werden zu ``VARCHAR(16)`` umgewandelt und die Namen durch
+    die Werte ersetzt. Bereits umgestellte Datenbanken prüfen nur je Spalte ein ``EXISTS``.
+    """
+    from .models import (  # pylint: disable=import-outside-toplevel
+        InventoryTransaction,
+        PurchaseOrder,
+        PurchaseOrderStatus,
+        TransactionType,
+    )
+
+    inspector = inspect(connection)
+    preparer = connection.dialect.identifier_preparer
+    for column, enum_type in (
+        (InventoryTransaction.__table__.c.transaction_type, TransactionType),
+        (PurchaseOrder.__table__.c.status, PurchaseOrderStatus),
+    ):
+        table = column.table
+        reflected_types = {entry["name"]: entry["type"] for entry in inspector.get_columns(table.name)}
+        reflected_type = reflected_types[column.name]
+        if connection.dialect.name == "postgresql" and isinstance(reflected_type, Enum):
+            # Die neuen Werte sind keine gültigen Labels des alten ENUM-Typs.
+            column_name = preparer.quote(column.name)
+            connection.execute(
+                text(
+                    f"ALTER TABLE {preparer.format_table(table)} ALTER COLUMN {column_name} "
+                    f"TYPE VARCHAR(16) USING {column_name}::text"
+                )
+            )
+            connection.execute(text(f"DROP TYPE IF EXISTS {preparer.quote(reflected_type.name)}"))
+
+        names = {member.name: member.value for member in enum_type}
+        if connection.execute(select(exists().where(column.in_(names)))).scalar():
+            connection.execute(
+                update(table).where(column.in_(names)).values({column: case(names, value=column)})
+            )
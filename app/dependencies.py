@@ -8,7 +8,6 @@ from fastapi import Depends
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from sqlalchemy.orm import Session
 
-from .crud import ensure_default_location
 from .database import SessionLocal
 from .erp import ERPClient, ERPService
 
@@ -18,6 +17,8 @@ class Settings(BaseSettings):
 
     erp_base_url: str | None = None
     erp_api_key: str | None = None
+    cors_origins: list[str] = ["*"]
+    threadpool_size: int | None = None
 
     model_config = SettingsConfigDict(env_prefix="WMS_", extra="ignore")
 
@@ -30,12 +31,23 @@ def get_settings() -> Settings:
 def get_db() -> Session:
     db = SessionLocal()
     try:
-        ensure_default_location(db)
         yield db
     finally:
         db.close()
 
 
+@lru_cache
+def _build_erp_service(base_url: str | None, api_key: str | None) -> ERPService:
+    return ERPService(ERPClient(base_url=base_url, api_key=api_key))
+
+
 def get_erp_service(settings: Settings = Depends(get_settings)) -> ERPService:
-    client = ERPClient(base_url=settings.erp_base_url, api_key=settings.erp_api_key)
-    return ERPService(client)
+    return _build_erp_service(settings.erp_base_url, settings.erp_api_key)
+
+
+async def close_erp_service() -> None:
+    """Schließt die Verbindungen des gemeinsam genutzten ERP-Clients."""
+
+    settings = get_settings()
+    await _build_erp_service(settings.erp_base_url, settings.erp_api_key).client.aclose()
+    _build_erp_service.cache_clear()
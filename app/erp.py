@@ -2,26 +2,115 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
-from datetime import datetime
+import os
+import time
+from collections.abc import AsyncIterator, Iterator
+from datetime import datetime, timezone
 from typing import Any
 
 import httpx
+import orjson
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from pydantic import TypeAdapter, ValidationError
 
 from . import crud, schemas
 
 LOGGER = logging.getLogger(__name__)
 
+ERP_INVENTORY_SYNC_PATH = "/inventory/sync"
+ERP_PURCHASE_ORDERS_PATH = "/purchase-orders/open"
+_JSON_BODY_HEADERS = {"Content-Type": "application/json"}
+# Über HTTP/2 teilen sich parallele Anfragen wenige Verbindungen; der Pool bleibt daher klein.
+_ERP_CONNECTION_LIMITS = httpx.Limits(
+    max_keepalive_connections=min((os.cpu_count() or 1) * 4, 32),
+    max_connections=100,
+    keepalive_expiry=60,
+)
+# Höchstzahl gleichzeitiger Seitenabrufe beim ERP.
+ERP_MAX_CONCURRENT_REQUESTS = 10
+
+WAREHOUSE_NAME = "Maschinenbau-Zentrallager"
+# Sekunden, in denen ein erneuter Export bei unverändertem Bestand nicht erneut gesendet wird.
+SNAPSHOT_PUSH_TTL = 5.0
+
+_ERP_ORDERS_ADAPTER = TypeAdapter(list[schemas.ERPPurchaseOrder])
+
+
+class InventorySnapshotStream:
+    """JSON-Body eines ``schemas.InventorySnapshot``, der blockweise aus den Einträgen erzeugt wird.
+
+    So liegt beim Export nie der gesamte Bestand gleichzeitig im Speicher. Die Blöcke werden im
+    Threadpool abgerufen, da sie aus der synchronen Datenbank-Session stammen. Die Einträge sind
+    Dictionaries mit den Feldern von ``schemas.InventorySnapshotEntry``; sie stammen direkt aus der
+    Datenbank und werden ohne erneute Validierung serialisiert.
+    """
+
+    def __init__(
+        self,
+        generated_at: datetime,
+        warehouse: str,
+        batches: Iterator[list[dict[str, Any]]],
+    ) -> None:
+        self.generated_at = generated_at
+        self.warehouse = warehouse
+        self.entry_count = 0
+        self._batches = batches
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        header = schemas.InventorySnapshot(
+            generated_at=self.generated_at, warehouse=self.warehouse, entries=[]
+        ).model_dump_json(exclude={"entries"})
+        yield header[:-1].encode() + b',"entries":['
+        separator = b""
+        async for batch in iterate_in_threadpool(self._batches):
+            if not batch:
+                continue
+            yield separator + orjson.dumps(batch)[1:-1]
+            separator = b","
+            self.entry_count += len(batch)
+        yield b"]}"
+
 
 class ERPClient:
     """Asynchrone Kommunikation mit einem ERP-System."""
 
-    def __init__(self, base_url: str | None, api_key: str | None = None, timeout: float = 10.0) -> None:
+    def __init__(
+        self,
+        base_url: str | None,
+        api_key: str | None = None,
+        timeout: float = 10.0,
+        http_client: httpx.AsyncClient | None = None,
+    ) -> None:
         self.base_url = base_url.rstrip("/") if base_url else None
         self.api_key = api_key
         self.timeout = timeout
+        # Die Header ändern sich nicht und werden einmalig am HTTP-Client hinterlegt.
+        self._headers = self._build_headers()
+        # Ein übergebener Client (z. B. mit MockTransport in Tests) muss base_url und Header bereits
+        # selbst gesetzt haben; er wird weder verändert noch geschlossen.
+        self._client = http_client
+        self._owns_client = http_client is None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Ein gemeinsamer Client hält Verbindungen zum ERP über mehrere Aufrufe offen.
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                headers=self._headers,
+                limits=_ERP_CONNECTION_LIMITS,
+                http2=True,
+            )
+        return self._client
 
-    async def push_inventory_snapshot(self, snapshot: schemas.InventorySnapshot) -> schemas.ERPExportResponse:
+    async def aclose(self) -> None:
+        if self._client is not None and self._owns_client:
+            await self._client.aclose()
+            self._client = None
+
+    async def push_inventory_snapshot(self, snapshot: InventorySnapshotStream) -> schemas.ERPExportResponse:
         if not self.base_url:
             return schemas.ERPExportResponse(
                 status="disabled",
@@ -29,19 +118,18 @@ class ERPClient:
                 message="ERP-Basis-URL ist nicht konfiguriert.",
             )
         try:
-            async with httpx.AsyncClient(
-                base_url=self.base_url,
-                timeout=self.timeout,
-                headers=self._build_headers(),
-            ) as client:
-                response = await client.post("/inventory/sync", json=snapshot.model_dump())
-                response.raise_for_status()
-                data = response.json()
+            response = await self._get_client().post(
+                ERP_INVENTORY_SYNC_PATH,
+                content=snapshot,
+                headers=_JSON_BODY_HEADERS,
+            )
+            response.raise_for_status()
+            data = response.json()
         except httpx.HTTPError as exc:  # pragma: no cover - Netzwerkausnahme
             LOGGER.warning("Fehler beim Senden an das ERP: %s", exc)
             return schemas.ERPExportResponse(status="error", transmitted=0, message=str(exc))
 
-        transmitted = int(data.get("transmitted", len(snapshot.entries))) if isinstance(data, dict) else len(snapshot.entries)
+        transmitted = int(data.get("transmitted", snapshot.entry_count)) if isinstance(data, dict) else snapshot.entry_count
         status = data.get("status", "ok") if isinstance(data, dict) else "ok"
         message = data.get("message") if isinstance(data, dict) else None
         return schemas.ERPExportResponse(status=status, transmitted=transmitted, message=message)
@@ -50,18 +138,31 @@ class ERPClient:
         if not self.base_url:
             return []
         try:
-            async with httpx.AsyncClient(
-                base_url=self.base_url,
-                timeout=self.timeout,
-                headers=self._build_headers(),
-            ) as client:
-                response = await client.get("/purchase-orders/open")
-                response.raise_for_status()
-                payload = response.json()
+            payload = await self._get_json(ERP_PURCHASE_ORDERS_PATH)
+            total_pages = payload.get("total_pages") if isinstance(payload, dict) else None
+            pages = [payload]
+            if isinstance(total_pages, int) and total_pages > 1:
+                # Weitere Seiten werden parallel, aber begrenzt abgerufen, um das ERP nicht zu überlasten.
+                semaphore = asyncio.Semaphore(ERP_MAX_CONCURRENT_REQUESTS)
+
+                async def fetch_page(page: int) -> Any:
+                    async with semaphore:
+                        return await self._get_json(ERP_PURCHASE_ORDERS_PATH, params={"page": page})
+
+                pages += await asyncio.gather(*(fetch_page(page) for page in range(2, total_pages + 1)))
         except httpx.HTTPError as exc:  # pragma: no cover - Netzwerkausnahme
             LOGGER.warning("Fehler beim Abrufen aus dem ERP: %s", exc)
             return []
 
+        return [order for page in pages for order in self._extract_orders(page)]
+
+    async def _get_json(self, path: str, params: dict[str, Any] | None = None) -> Any:
+        response = await self._get_client().get(path, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    @staticmethod
+    def _extract_orders(payload: Any) -> list[dict[str, Any]]:
         if isinstance(payload, dict):
             orders = payload.get("orders", [])
             if isinstance(orders, list):
@@ -85,36 +186,50 @@ class ERPService:
 
     def __init__(self, client: ERPClient) -> None:
         self.client = client
+        self._push_lock = asyncio.Lock()
+        self._last_push: tuple[tuple[Any, ...], float, schemas.ERPExportResponse] | None = None
+        # Zuletzt erhaltene Ergebnisse mit Zeitpunkt, für die Anzeige im Dashboard.
+        self.last_export: tuple[datetime, schemas.ERPExportResponse] | None = None
+        self.last_sync: tuple[datetime, schemas.ERPImportResult] | None = None
 
-    def build_inventory_snapshot(self, db) -> schemas.InventorySnapshot:
-        entries: list[schemas.InventorySnapshotEntry] = []
-        for level in crud.list_stock_levels(db):
-            entries.append(
-                schemas.InventorySnapshotEntry(
-                    sku=level.item.sku,
-                    item_name=level.item.name,
-                    location=level.location.name,
-                    quantity=float(level.quantity),
-                    unit_of_measure=level.item.unit_of_measure,
-                )
-            )
-        return schemas.InventorySnapshot(
-            generated_at=datetime.utcnow(),
-            warehouse="Maschinenbau-Zentrallager",
-            entries=entries,
-        )
+    def iter_inventory_snapshot_batches(self, db, batch_size: int = 500) -> Iterator[list[dict[str, Any]]]:
+        for rows in crud.iter_inventory_snapshot_rows(db, batch_size):
+            yield [row._asdict() for row in rows]
 
     async def push_inventory_snapshot(self, db) -> schemas.ERPExportResponse:
-        snapshot = self.build_inventory_snapshot(db)
-        return await self.client.push_inventory_snapshot(snapshot)
+        # Kurz aufeinanderfolgende Exporte werden nacheinander abgearbeitet. Hat sich der Bestand
+        # seit dem letzten erfolgreichen Export nicht geändert, wird dessen Ergebnis zurückgegeben.
+        # Umbenennungen von Artikeln oder Lagerorten werden dabei erst nach Ablauf der TTL gesendet.
+        async with self._push_lock:
+            fingerprint = await run_in_threadpool(crud.get_inventory_fingerprint, db)
+            last_push = self._last_push
+            if last_push is not None and last_push[0] == fingerprint and last_push[1] > time.monotonic():
+                return last_push[2]
+
+            # Die Einträge werden erst beim Senden blockweise gelesen und serialisiert.
+            snapshot = InventorySnapshotStream(
+                generated_at=datetime.now(timezone.utc),
+                warehouse=WAREHOUSE_NAME,
+                batches=self.iter_inventory_snapshot_batches(db),
+            )
+            result = await self.client.push_inventory_snapshot(snapshot)
+            self.last_export = (datetime.now().astimezone(), result)
+            if result.status != "error":
+                self._last_push = (fingerprint, time.monotonic() + SNAPSHOT_PUSH_TTL, result)
+            return result
 
     async def fetch_purchase_orders(self) -> list[schemas.ERPPurchaseOrder]:
         raw_orders = await self.client.fetch_purchase_orders()
+        try:
+            return _ERP_ORDERS_ADAPTER.validate_python(raw_orders)
+        except ValidationError:
+            pass
+        # Nur wenn die Liste ungültige Aufträge enthält, wird einzeln validiert, um diese zu überspringen.
         orders: list[schemas.ERPPurchaseOrder] = []
         for raw_order in raw_orders:
             try:
                 orders.append(schemas.ERPPurchaseOrder.model_validate(raw_order))
-            except Exception as exc:  # pragma: no cover - Validierungsfehler
+            except ValidationError as exc:  # pragma: no cover - Validierungsfehler
                 LOGGER.warning("Ungültiger ERP-Auftrag übersprungen: %s", exc)
         return orders
 
@@ -123,6 +238,9 @@ class ERPService:
 
     async def sync_purchase_orders(self, db) -> schemas.ERPImportResult:
         orders = await self.fetch_purchase_orders()
-        if not orders:
-            return schemas.ERPImportResult(details=["Keine Bestellungen vom ERP erhalten."])
-        return self.import_purchase_orders(db, orders)
+        if orders:
+            result = await run_in_threadpool(self.import_purchase_orders, db, orders)
+        else:
+            result = schemas.ERPImportResult(details=["Keine Bestellungen vom ERP erhalten."])
+        self.last_sync = (datetime.now().astimezone(), result)
+        return result
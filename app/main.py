@@ -2,33 +2,74 @@
 
 from __future__ import annotations
 
-from fastapi import FastAPI
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+import anyio.to_thread
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
 from .api import api_router
-from .database import init_db
+from .crud import ensure_default_location
+from .database import SessionLocal, init_db
+from .dependencies import close_erp_service, get_settings
 from .web import router as web_router
 
 
-def create_app() -> FastAPI:
-    """Erzeugt und konfiguriert die FastAPI-Anwendung."""
+# Die Assets tragen keinen Hash im Dateinamen; nach Ablauf prüfen Browser per ETag auf Änderungen.
+STATIC_CACHE_CONTROL = "public, max-age=3600"
+
+
+class CachedStaticFiles(StaticFiles):
+    """Statische Dateien mit Cache-Control-Header."""
+
+    def file_response(self, *args: Any, **kwargs: Any) -> Response:
+        response = super().file_response(*args, **kwargs)
+        response.headers.setdefault("Cache-Control", STATIC_CACHE_CONTROL)
+        return response
+
 
+def _prepare_database() -> None:
     init_db()
+    # Der Standardlagerort wird einmalig beim Start angelegt statt bei jedem Request geprüft.
+    with SessionLocal() as db:
+        ensure_default_location(db)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Synchrone Handler und Datenbankzugriffe laufen im Threadpool von AnyIO; dessen Größe
+    # begrenzt, wie viele davon gleichzeitig bearbeitet werden (Standard: 40).
+    threadpool_size = get_settings().threadpool_size
+    if threadpool_size:
+        anyio.to_thread.current_default_thread_limiter().total_tokens = threadpool_size
+    # Die Datenbank wird beim Serverstart statt beim Import des Moduls vorbereitet.
+    await asyncio.to_thread(_prepare_database)
+    yield
+    await close_erp_service()
+
+
+def create_app() -> FastAPI:
+    """Erzeugt und konfiguriert die FastAPI-Anwendung."""
 
-    app = FastAPI(title="Lagerverwaltung Maschinenbau", version="1.0.0")
+    app = FastAPI(title="Lagerverwaltung Maschinenbau", version="1.0.0", lifespan=lifespan)
 
+    # Feste Methoden und Header sowie ein langes max_age lassen Browser Preflight-Antworten cachen.
     app.add_middleware(
         CORSMiddleware,
-        allow_origins=["*"],
+        allow_origins=get_settings().cors_origins,
         allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
+        allow_methods=["GET", "POST", "PUT", "DELETE"],
+        allow_headers=["Authorization", "Content-Type"],
+        max_age=86400,
     )
 
     app.include_router(web_router)
     app.include_router(api_router, prefix="/api")
-    app.mount("/static", StaticFiles(directory="static"), name="static")
+    app.mount("/static", CachedStaticFiles(directory="static"), name="static")
 
     return app
 
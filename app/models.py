@@ -9,16 +9,16 @@ from sqlalchemy import (
     CheckConstraint,
     Date,
     DateTime,
-    Enum,
     Float,
     ForeignKey,
+    Index,
     Integer,
-    Numeric,
     String,
     Text,
     UniqueConstraint,
+    func,
 )
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
 
 from .database import Base
 
@@ -40,6 +40,11 @@ class PurchaseOrderStatus(str, enum.Enum):
     CANCELLED = "cancelled"
 
 
+def _enum_check(column: str, enum_type: type[enum.Enum]) -> str:
+    values = ", ".join(f"'{member.value}'" for member in enum_type)
+    return f"{column} IN ({values})"
+
+
 class Item(Base):
     """Artikelstammdaten."""
 
@@ -82,6 +87,12 @@ class StorageLocation(Base):
     )
 
 
+def normalize_supplier_name(name: str) -> str:
+    """Vergleichsschlüssel für Lieferantennamen ohne Groß-/Kleinschreibung und Randleerzeichen."""
+
+    return name.strip().lower()
+
+
 class Supplier(Base):
     """Lieferant für Bestellungen."""
 
@@ -90,6 +101,8 @@ class Supplier(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
+    # Lieferanten werden beim ERP-Import über diesen Schlüssel gesucht.
+    name_norm: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
     contact_email: Mapped[str | None] = mapped_column(String(255))
     contact_phone: Mapped[str | None] = mapped_column(String(64))
     notes: Mapped[str | None] = mapped_column(Text())
@@ -98,6 +111,11 @@ class Supplier(Base):
         "PurchaseOrder", back_populates="supplier"
     )
 
+    @validates("name")
+    def _set_name_norm(self, key: str, value: str) -> str:
+        self.name_norm = normalize_supplier_name(value)
+        return value
+
 
 class StockLevel(Base):
     """Bestand eines Artikels an einem konkreten Lagerort."""
@@ -106,6 +124,8 @@ class StockLevel(Base):
     __table_args__ = (
         UniqueConstraint("item_id", "location_id", name="uq_stock_levels_item_location"),
         CheckConstraint("quantity >= 0", name="ck_stock_levels_quantity_positive"),
+        # Abfragen nach item_id nutzen bereits den Index der Unique-Constraint.
+        Index("ix_stock_levels_location_id", "location_id"),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
@@ -123,6 +143,13 @@ class InventoryTransaction(Base):
     """Historie einzelner Lagerbewegungen."""
 
     __tablename__ = "inventory_transactions"
+    __table_args__ = (
+        Index("ix_inventory_transactions_created_at", "created_at"),
+        Index("ix_inventory_transactions_item_id_created_at", "item_id", "created_at"),
+        CheckConstraint(_enum_check("transaction_type", TransactionType), name="ck_inventory_transactions_type"),
+    )
+    # Den von der Datenbank gesetzten Zeitstempel direkt beim INSERT zurücklesen.
+    __mapper_args__ = {"eager_defaults": True}
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     item_id: Mapped[int] = mapped_column(ForeignKey("items.id", ondelete="CASCADE"), nullable=False)
@@ -130,41 +157,61 @@ class InventoryTransaction(Base):
         ForeignKey("storage_locations.id", ondelete="CASCADE"), nullable=False
     )
     quantity: Mapped[float] = mapped_column(Float, nullable=False)
-    transaction_type: Mapped[TransactionType] = mapped_column(Enum(TransactionType), nullable=False)
+    # Enum-Werte werden als Text gespeichert und gelesen; die Schemas wandeln sie in Enums um.
+    transaction_type: Mapped[str] = mapped_column(String(16), nullable=False)
     reference: Mapped[str | None] = mapped_column(String(128))
     note: Mapped[str | None] = mapped_column(Text())
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=func.now(), server_default=func.now(), nullable=False
+    )
 
     item: Mapped[Item] = relationship("Item", back_populates="transactions")
     location: Mapped[StorageLocation] = relationship("StorageLocation", back_populates="transactions")
 
+    @validates("transaction_type")
+    def _validate_transaction_type(self, key: str, value: str) -> str:
+        return TransactionType(value).value
+
 
 class PurchaseOrder(Base):
     """Bestellkopf für externe Beschaffung."""
 
     __tablename__ = "purchase_orders"
-    __table_args__ = (UniqueConstraint("order_number", name="uq_purchase_orders_number"),)
+    __table_args__ = (
+        UniqueConstraint("order_number", name="uq_purchase_orders_number"),
+        Index("ix_purchase_orders_created_at", "created_at"),
+        CheckConstraint(_enum_check("status", PurchaseOrderStatus), name="ck_purchase_orders_status"),
+    )
+    __mapper_args__ = {"eager_defaults": True}
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     order_number: Mapped[str] = mapped_column(String(64), nullable=False)
     supplier_id: Mapped[int | None] = mapped_column(ForeignKey("suppliers.id"))
-    status: Mapped[PurchaseOrderStatus] = mapped_column(
-        Enum(PurchaseOrderStatus), default=PurchaseOrderStatus.DRAFT, nullable=False
-    )
+    status: Mapped[str] = mapped_column(String(16), default=PurchaseOrderStatus.DRAFT.value, nullable=False)
     expected_date: Mapped[date | None] = mapped_column(Date)
     notes: Mapped[str | None] = mapped_column(Text())
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=func.now(), server_default=func.now(), nullable=False
+    )
 
     supplier: Mapped[Supplier | None] = relationship("Supplier", back_populates="purchase_orders")
     lines: Mapped[list["PurchaseOrderLine"]] = relationship(
         "PurchaseOrderLine", back_populates="purchase_order", cascade="all, delete-orphan"
     )
 
+    @validates("status")
+    def _validate_status(self, key: str, value: str) -> str:
+        return PurchaseOrderStatus(value).value
+
 
 class PurchaseOrderLine(Base):
     """Position innerhalb einer Bestellung."""
 
     __tablename__ = "purchase_order_lines"
+    __table_args__ = (
+        Index("ix_purchase_order_lines_purchase_order_id", "purchase_order_id"),
+        Index("ix_purchase_order_lines_item_id", "item_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     purchase_order_id: Mapped[int] = mapped_column(
@@ -172,8 +219,8 @@ class PurchaseOrderLine(Base):
     )
     item_id: Mapped[int] = mapped_column(ForeignKey("items.id", ondelete="SET NULL"))
     description: Mapped[str | None] = mapped_column(Text())
-    ordered_quantity: Mapped[float] = mapped_column(Numeric(12, 2), nullable=False)
-    received_quantity: Mapped[float] = mapped_column(Numeric(12, 2), default=0, nullable=False)
+    ordered_quantity: Mapped[float] = mapped_column(Float, nullable=False)
+    received_quantity: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
     unit_price: Mapped[float | None] = mapped_column(Float)
 
     purchase_order: Mapped[PurchaseOrder] = relationship("PurchaseOrder", back_populates="lines")
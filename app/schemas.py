@@ -143,7 +143,7 @@ class PurchaseOrderRead(PurchaseOrderBase):
     id: int
     created_at: datetime
     supplier: SupplierRead | None = None
-    lines: list[PurchaseOrderLineRead] = []
+    lines: list[PurchaseOrderLineRead] = Field(default_factory=list)
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -183,7 +183,7 @@ class ERPImportResult(BaseModel):
     imported: int = 0
     updated: int = 0
     skipped: int = 0
-    details: list[str] = []
+    details: list[str] = Field(default_factory=list)
 
 
 class ERPExportResponse(BaseModel):
@@ -2,27 +2,82 @@
 
 from __future__ import annotations
 
-from datetime import date
-from urllib.parse import urlencode
-
-from fastapi import APIRouter, Depends, Form, HTTPException, Request, status
-from fastapi.responses import HTMLResponse, RedirectResponse
+import hashlib
+import logging
+from collections.abc import Awaitable, Callable
+from urllib.parse import quote
+
+from fastapi import APIRouter, BackgroundTasks, Depends, Form, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemLoader
 from sqlalchemy.orm import Session
 
 from . import crud, schemas
+from .database import SessionLocal
 from .dependencies import get_db, get_erp_service
 from .erp import ERPService
 from .models import PurchaseOrder, PurchaseOrderLine, PurchaseOrderStatus, TransactionType
 
+LOGGER = logging.getLogger(__name__)
+
 router = APIRouter(include_in_schema=False)
-templates = Jinja2Templates(directory="templates")
+# Templates werden einmalig beim Import kompiliert und ohne Prüfung auf Dateiänderungen
+# wiederverwendet; Änderungen an Templates erfordern einen Neustart.
+templates = Jinja2Templates(
+    env=Environment(loader=FileSystemLoader("templates"), autoescape=True, auto_reload=False, cache_size=-1)
+)
+for _template_name in templates.env.list_templates(extensions=["html"]):
+    templates.env.get_template(_template_name)
+
+# Auswahlwerte der Formulare; Enums ändern sich zur Laufzeit nicht.
+_TRANSACTION_TYPES = tuple(TransactionType)
+_PURCHASE_ORDER_STATUSES = tuple(PurchaseOrderStatus)
+
+
+# Anzahl gerenderter Template-Fragmente, die zu einem gesendeten Block zusammengefasst werden.
+_TEMPLATE_STREAM_BUFFER = 1024
+
+
+def _stream_template(name: str, context: dict[str, object]) -> StreamingResponse:
+    """Rendert ein Template blockweise, statt die ganze Seite im Speicher aufzubauen.
+
+    Alle Daten müssen beim Aufruf bereits geladen sein: Die Session aus ``get_db`` kann
+    geschlossen werden, bevor der Body gesendet ist.
+    """
+
+    stream = templates.get_template(name).stream(context)
+    stream.enable_buffering(size=_TEMPLATE_STREAM_BUFFER)
+    return StreamingResponse((chunk.encode() for chunk in stream), media_type="text/html")
+
+
+# Seiten mit ETag darf der Browser speichern, muss sie aber vor jeder Nutzung erneut prüfen.
+_PAGE_CACHE_CONTROL = "private, no-cache"
+
+
+def _with_etag(request: Request, response: HTMLResponse) -> Response:
+    """Versieht eine gerenderte Seite mit einem ETag und beantwortet passende Anfragen mit 304.
 
+    Der ETag ist ein Hash des HTML; Abfrage und Rendering finden also weiterhin statt, nur
+    die Übertragung einer unveränderten Seite entfällt.
+    """
 
-def _redirect(url: str, **params: str) -> RedirectResponse:
-    if params:
-        url = f"{url}?{urlencode(params)}"
-    return RedirectResponse(url, status_code=status.HTTP_303_SEE_OTHER)
+    etag = f'"{hashlib.sha1(response.body, usedforsecurity=False).hexdigest()}"'
+    headers = {"etag": etag, "cache-control": _PAGE_CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in tags or "*" in tags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return response
+
+
+def _redirect(url: str, message: str) -> Response:
+    # Die URL ist bereits vollständig kodiert; RedirectResponse würde sie ein zweites Mal quoten.
+    location = f"{url}?message={quote(message, safe='')}"
+    return Response(status_code=status.HTTP_303_SEE_OTHER, headers={"location": location})
 
 
 @router.get("/", response_class=HTMLResponse)
@@ -31,15 +86,18 @@ def dashboard(
     message: str | None = None,
     error: str | None = None,
     db: Session = Depends(get_db),
-) -> HTMLResponse:
+    service: ERPService = Depends(get_erp_service),
+) -> Response:
     metrics = crud.get_inventory_overview(db)
     context = {
         "request": request,
         "metrics": metrics,
+        "last_export": service.last_export,
+        "last_sync": service.last_sync,
         "message": message,
         "error": error,
     }
-    return templates.TemplateResponse("dashboard.html", context)
+    return _with_etag(request, templates.TemplateResponse("dashboard.html", context))
 
 
 @router.get("/planning", response_class=HTMLResponse)
@@ -50,51 +108,29 @@ def show_planning(
     db: Session = Depends(get_db),
 ) -> HTMLResponse:
     suggestions = crud.get_planning_overview(db)
-    monitored = [entry for entry in suggestions if entry.reorder_level > 0]
-    needs_reorder = [entry for entry in monitored if entry.needs_reorder]
-
-    open_orders_data: list[dict[str, object]] = []
-    for order in crud.list_purchase_orders(db):
-        if order.status in {PurchaseOrderStatus.CANCELLED, PurchaseOrderStatus.COMPLETED}:
-            continue
-        remaining = 0.0
-        outstanding_lines = 0
-        for line in order.lines:
-            ordered = float(line.ordered_quantity or 0)
-            received = float(line.received_quantity or 0)
-            open_quantity = ordered - received
-            if open_quantity > 0:
-                outstanding_lines += 1
-                remaining += open_quantity
-        if outstanding_lines == 0 and remaining <= 0:
-            continue
-        open_orders_data.append(
-            {
-                "order": order,
-                "remaining": remaining,
-                "outstanding_lines": outstanding_lines,
-            }
-        )
+    monitored = needs_reorder = 0
+    recommended_quantity = 0.0
+    for entry in suggestions:
+        if entry.reorder_level > 0:
+            monitored += 1
+            if entry.needs_reorder:
+                needs_reorder += 1
+                recommended_quantity += entry.suggested_order
 
-    open_orders_data.sort(
-        key=lambda entry: (
-            entry["order"].expected_date or date.max,
-            entry["order"].order_number,
-        )
-    )
+    open_orders = crud.list_open_purchase_order_totals(db)
 
     summary = {
-        "total_items": len(monitored) if monitored else len(suggestions),
-        "needs_reorder": len(needs_reorder),
-        "recommended_quantity": sum(entry.suggested_order for entry in needs_reorder),
-        "open_orders": len(open_orders_data),
+        "total_items": monitored or len(suggestions),
+        "needs_reorder": needs_reorder,
+        "recommended_quantity": recommended_quantity,
+        "open_orders": len(open_orders),
     }
 
     context = {
         "request": request,
         "suggestions": suggestions,
         "summary": summary,
-        "open_orders": open_orders_data,
+        "open_orders": open_orders,
         "message": message,
         "error": error,
     }
@@ -107,7 +143,7 @@ def show_items(
     message: str | None = None,
     error: str | None = None,
     db: Session = Depends(get_db),
-) -> HTMLResponse:
+) -> StreamingResponse:
     items = crud.list_items(db)
     context = {
         "request": request,
@@ -115,11 +151,11 @@ def show_items(
         "message": message,
         "error": error,
     }
-    return templates.TemplateResponse("items/list.html", context)
+    return _stream_template("items/list.html", context)
 
 
 @router.post("/items")
-async def create_item(
+def create_item(
     request: Request,
     sku: str = Form(...),
     name: str = Form(...),
@@ -153,7 +189,7 @@ def show_locations(
     message: str | None = None,
     error: str | None = None,
     db: Session = Depends(get_db),
-) -> HTMLResponse:
+) -> Response:
     locations = crud.list_locations(db)
     context = {
         "request": request,
@@ -161,11 +197,11 @@ def show_locations(
         "message": message,
         "error": error,
     }
-    return templates.TemplateResponse("locations/list.html", context)
+    return _with_etag(request, templates.TemplateResponse("locations/list.html", context))
 
 
 @router.post("/locations")
-async def create_location(
+def create_location(
     request: Request,
     name: str = Form(...),
     description: str = Form(""),
@@ -190,7 +226,7 @@ def show_suppliers(
     message: str | None = None,
     error: str | None = None,
     db: Session = Depends(get_db),
-) -> HTMLResponse:
+) -> Response:
     suppliers = crud.list_suppliers(db)
     context = {
         "request": request,
@@ -198,11 +234,11 @@ def show_suppliers(
         "message": message,
         "error": error,
     }
-    return templates.TemplateResponse("suppliers/list.html", context)
+    return _with_etag(request, templates.TemplateResponse("suppliers/list.html", context))
 
 
 @router.post("/suppliers")
-async def create_supplier(
+def create_supplier(
     request: Request,
     name: str = Form(...),
     contact_email: str = Form(""),
@@ -228,6 +264,40 @@ async def create_supplier(
     return _redirect(router.url_path_for("show_suppliers"), message="Lieferant angelegt")
 
 
+def _inventory_context(
+    request: Request, db: Session, message: str | None = None, error: str | None = None
+) -> dict[str, object]:
+    """Kontext der Bestandsseite, gemeinsam für Anzeige und Fehlerfall der Formulare."""
+
+    stock_levels, items, locations, transactions = crud.load_inventory_page(db)
+    return {
+        "request": request,
+        "stock_levels": stock_levels,
+        "items": items,
+        "locations": locations,
+        "transactions": transactions,
+        "transaction_types": _TRANSACTION_TYPES,
+        "message": message,
+        "error": error,
+    }
+
+
+def _purchase_order_context(
+    request: Request, db: Session, message: str | None = None, error: str | None = None
+) -> dict[str, object]:
+    """Kontext der Bestellseite, gemeinsam für Anzeige und Fehlerfall der Formulare."""
+
+    return {
+        "request": request,
+        "orders": crud.list_purchase_orders(db),
+        "suppliers": crud.list_suppliers(db),
+        "items": crud.list_items(db),
+        "status_values": _PURCHASE_ORDER_STATUSES,
+        "message": message,
+        "error": error,
+    }
+
+
 @router.get("/inventory", response_class=HTMLResponse)
 def show_inventory(
     request: Request,
@@ -235,21 +305,12 @@ def show_inventory(
     error: str | None = None,
     db: Session = Depends(get_db),
 ) -> HTMLResponse:
-    context = {
-        "request": request,
-        "stock_levels": crud.list_stock_levels(db),
-        "items": crud.list_items(db),
-        "locations": crud.list_locations(db),
-        "transactions": crud.list_transactions(db, limit=15),
-        "transaction_types": list(TransactionType),
-        "message": message,
-        "error": error,
-    }
+    context = _inventory_context(request, db, message=message, error=error)
     return templates.TemplateResponse("inventory/list.html", context)
 
 
 @router.post("/inventory/movements")
-async def create_inventory_movement(
+def create_inventory_movement(
     request: Request,
     item_id: int = Form(...),
     location_id: int = Form(...),
@@ -270,15 +331,7 @@ async def create_inventory_movement(
         )
         crud.register_inventory_transaction(db, movement)
     except (ValueError, crud.CRUDException) as exc:
-        context = {
-            "request": request,
-            "stock_levels": crud.list_stock_levels(db),
-            "items": crud.list_items(db),
-            "locations": crud.list_locations(db),
-            "transactions": crud.list_transactions(db, limit=15),
-            "transaction_types": list(TransactionType),
-            "error": str(exc),
-        }
+        context = _inventory_context(request, db, error=str(exc))
         return templates.TemplateResponse("inventory/list.html", context, status_code=status.HTTP_400_BAD_REQUEST)
     return _redirect(router.url_path_for("show_inventory"), message="Bewegung erfasst")
 
@@ -289,21 +342,13 @@ def show_purchase_orders(
     message: str | None = None,
     error: str | None = None,
     db: Session = Depends(get_db),
-) -> HTMLResponse:
-    context = {
-        "request": request,
-        "orders": crud.list_purchase_orders(db),
-        "suppliers": crud.list_suppliers(db),
-        "items": crud.list_items(db),
-        "status_values": list(PurchaseOrderStatus),
-        "message": message,
-        "error": error,
-    }
-    return templates.TemplateResponse("purchase_orders/list.html", context)
+) -> StreamingResponse:
+    context = _purchase_order_context(request, db, message=message, error=error)
+    return _stream_template("purchase_orders/list.html", context)
 
 
 @router.post("/purchase-orders")
-async def create_purchase_order(
+def create_purchase_order(
     request: Request,
     order_number: str = Form(...),
     supplier_id: str = Form(""),
@@ -312,32 +357,24 @@ async def create_purchase_order(
     notes: str = Form(""),
     db: Session = Depends(get_db),
 ) -> HTMLResponse:
-    supplier_id_value = int(supplier_id) if supplier_id else None
-    expected = date.fromisoformat(expected_date) if expected_date else None
-    order_in = schemas.PurchaseOrderCreate(
-        order_number=order_number,
-        supplier_id=supplier_id_value,
-        status=PurchaseOrderStatus(status_value),
-        expected_date=expected,
-        notes=notes or None,
-    )
     try:
+        # Pydantic wandelt die Formularwerte (str) selbst in int, date und Status um.
+        order_in = schemas.PurchaseOrderCreate(
+            order_number=order_number,
+            supplier_id=supplier_id or None,
+            status=status_value,
+            expected_date=expected_date or None,
+            notes=notes or None,
+        )
         crud.create_purchase_order(db, order_in)
     except (ValueError, crud.CRUDException) as exc:
-        context = {
-            "request": request,
-            "orders": crud.list_purchase_orders(db),
-            "suppliers": crud.list_suppliers(db),
-            "items": crud.list_items(db),
-            "status_values": list(PurchaseOrderStatus),
-            "error": str(exc),
-        }
+        context = _purchase_order_context(request, db, error=str(exc))
         return templates.TemplateResponse("purchase_orders/list.html", context, status_code=status.HTTP_400_BAD_REQUEST)
     return _redirect(router.url_path_for("show_purchase_orders"), message="Bestellung angelegt")
 
 
 @router.post("/purchase-orders/{order_id}/lines")
-async def add_purchase_order_line(
+def add_purchase_order_line(
     order_id: int,
     request: Request,
     item_id: str = Form(""),
@@ -349,31 +386,22 @@ async def add_purchase_order_line(
     order = db.get(PurchaseOrder, order_id)
     if not order:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Bestellung nicht gefunden")
-    item_id_value = int(item_id) if item_id else None
-    unit_price_value = float(unit_price) if unit_price else None
-    line_in = schemas.PurchaseOrderLineCreate(
-        item_id=item_id_value,
-        description=description or None,
-        ordered_quantity=ordered_quantity,
-        unit_price=unit_price_value,
-    )
     try:
+        line_in = schemas.PurchaseOrderLineCreate(
+            item_id=item_id or None,
+            description=description or None,
+            ordered_quantity=ordered_quantity,
+            unit_price=unit_price or None,
+        )
         crud.add_purchase_order_line(db, order, line_in)
-    except crud.CRUDException as exc:
-        context = {
-            "request": request,
-            "orders": crud.list_purchase_orders(db),
-            "suppliers": crud.list_suppliers(db),
-            "items": crud.list_items(db),
-            "status_values": list(PurchaseOrderStatus),
-            "error": str(exc),
-        }
+    except (ValueError, crud.CRUDException) as exc:
+        context = _purchase_order_context(request, db, error=str(exc))
         return templates.TemplateResponse("purchase_orders/list.html", context, status_code=status.HTTP_400_BAD_REQUEST)
     return _redirect(router.url_path_for("show_purchase_orders"), message="Position hinzugefügt")
 
 
 @router.post("/purchase-orders/{order_id}/receive")
-async def receive_purchase_order(
+def receive_purchase_order(
     order_id: int,
     request: Request,
     line_id: int = Form(...),
@@ -386,32 +414,40 @@ async def receive_purchase_order(
     try:
         crud.set_purchase_order_line_received(db, line, received_quantity)
     except crud.CRUDException as exc:
-        context = {
-            "request": request,
-            "orders": crud.list_purchase_orders(db),
-            "suppliers": crud.list_suppliers(db),
-            "items": crud.list_items(db),
-            "status_values": list(PurchaseOrderStatus),
-            "error": str(exc),
-        }
+        context = _purchase_order_context(request, db, error=str(exc))
         return templates.TemplateResponse("purchase_orders/list.html", context, status_code=status.HTTP_400_BAD_REQUEST)
     return _redirect(router.url_path_for("show_purchase_orders"), message="Wareneingang aktualisiert")
 
 
+async def _run_erp_task(operation: Callable[[Session], Awaitable[object]], label: str) -> None:
+    """Führt einen ERP-Abgleich nach dem Senden der Antwort mit eigener Session aus.
+
+    Die Session aus ``get_db`` ist zu diesem Zeitpunkt bereits geschlossen. Das Ergebnis
+    hält der ``ERPService`` für das Dashboard fest.
+    """
+
+    db = SessionLocal()
+    try:
+        await operation(db)
+    except Exception:
+        LOGGER.exception("%s fehlgeschlagen", label)
+    finally:
+        await run_in_threadpool(db.close)
+
+
 @router.post("/erp/export")
 async def trigger_erp_export(
+    background_tasks: BackgroundTasks,
     service: ERPService = Depends(get_erp_service),
-    db: Session = Depends(get_db),
-) -> HTMLResponse:
-    result = await service.push_inventory_snapshot(db)
-    return _redirect(router.url_path_for("dashboard"), message=f"ERP-Export: {result.status}")
+) -> Response:
+    background_tasks.add_task(_run_erp_task, service.push_inventory_snapshot, "ERP-Export")
+    return _redirect(router.url_path_for("dashboard"), message="ERP-Export gestartet")
 
 
 @router.post("/erp/sync")
 async def trigger_erp_sync(
+    background_tasks: BackgroundTasks,
     service: ERPService = Depends(get_erp_service),
-    db: Session = Depends(get_db),
-) -> HTMLResponse:
-    result = await service.sync_purchase_orders(db)
-    message = f"Importiert: {result.imported}, Aktualisiert: {result.updated}, Übersprungen: {result.skipped}"
-    return _redirect(router.url_path_for("dashboard"), message=message)
+) -> Response:
+    background_tasks.add_task(_run_erp_task, service.sync_purchase_orders, "ERP-Abgleich")
+    return _redirect(router.url_path_for("dashboard"), message="ERP-Abgleich gestartet")
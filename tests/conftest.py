@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Muss vor dem ersten Import von ``app`` gesetzt sein, da die Engine beim Import entsteht.
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test.db")
@@ -0,0 +1,45 @@
+import pytest
+from sqlalchemy import event, select
+
+from app import crud, schemas
+from app.database import SessionLocal, engine, init_db
+from app.models import PurchaseOrder
+
+
+@pytest.fixture
+def db():
+    init_db()
+    with SessionLocal() as session:
+        yield session
+
+
+def _order(order_number: str) -> schemas.ERPPurchaseOrder:
+    return schemas.ERPPurchaseOrder(
+        order_number=order_number,
+        supplier_name="Testlieferant",
+        lines=[{"sku": "T-1", "name": "Testartikel", "ordered_quantity": 2}],
+    )
+
+
+def test_import_requires_session_without_open_transaction(db):
+    crud.list_items(db)
+
+    with pytest.raises(RuntimeError):
+        crud.import_purchase_orders_from_payload(db, [_order("T-OPEN")])
+
+
+def test_import_runs_in_immediate_transaction(db):
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        result = crud.import_purchase_orders_from_payload(db, [_order("T-FRESH")])
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert result.imported == 1
+    assert statements[0] == "BEGIN IMMEDIATE"
+    assert db.scalar(select(PurchaseOrder).where(PurchaseOrder.order_number == "T-FRESH")) is not None